@@ -0,0 +1,13 @@
+-- Migration: Composite index for per-patient recent-reading queries
+-- Date: 2026-10-15
+
+-- Recent-reading queries filter by patient and read the newest rows first
+-- (ORDER BY timestamp DESC LIMIT n). With (patient_id, timestamp DESC) the
+-- planner walks the index in order and stops after LIMIT rows instead of
+-- sorting every reading for the patient. Unfiltered queries already use
+-- idx_sensor_readings_timestamp from the initial schema.
+CREATE INDEX IF NOT EXISTS idx_sensor_readings_patient_ts
+    ON sensor_readings (patient_id, timestamp DESC);
+
+-- The composite index serves every lookup the single-column index did
+DROP INDEX IF EXISTS idx_sensor_readings_patient_id;
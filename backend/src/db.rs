@@ -59,6 +59,58 @@ impl Database {
         Ok(id)
     }
 
+    /// Insert a batch of sensor readings in a single transaction
+    ///
+    /// Either every reading is committed or, on error, none of them are.
+    pub async fn insert_readings(&self, readings: &[SensorReading]) -> Result<Vec<Uuid>, AppError> {
+        tracing::debug!(count = readings.len(), "Inserting sensor reading batch");
+
+        let mut tx = self.pool.begin().await.map_err(|e| {
+            tracing::error!(error = %e, "Failed to begin sensor reading batch transaction");
+            AppError::Internal
+        })?;
+
+        let mut ids = Vec::with_capacity(readings.len());
+        for reading in readings {
+            let code_str = match reading.code {
+                SignalCode::Sound => "sound",
+            };
+
+            let id = sqlx::query_scalar::<_, Uuid>(
+                r#"
+                INSERT INTO sensor_readings (patient_id, device_id, code, value, unit, timestamp)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                RETURNING id
+                "#,
+            )
+            .bind(&reading.patient_id)
+            .bind(&reading.device_id)
+            .bind(code_str)
+            .bind(reading.value)
+            .bind(&reading.unit)
+            .bind(reading.ts)
+            .fetch_one(&mut *tx)
+            .await
+            .map_err(|e| {
+                tracing::error!(error = %e, "Failed to insert sensor reading batch");
+                AppError::Internal
+            })?;
+            ids.push(id);
+        }
+
+        // Dropping the transaction on any error above rolls it back
+        tx.commit().await.map_err(|e| {
+            tracing::error!(error = %e, "Failed to commit sensor reading batch");
+            AppError::Internal
+        })?;
+
+        tracing::debug!(
+            count = ids.len(),
+            "Successfully inserted sensor reading batch"
+        );
+        Ok(ids)
+    }
+
     /// Get recent sensor readings with optional code filter
     pub async fn get_recent_readings(
         &self,
@@ -74,6 +74,34 @@ impl AppState {
         Ok(())
     }
 
+    /// Push a batch of sensor readings to both database (if available) and in-memory storage
+    /// The database insert is a single transaction, so the batch is stored whole or not at all;
+    /// like `push`, a database failure falls back to in-memory storage for the entire batch
+    pub async fn push_batch(&mut self, readings: Vec<SensorReading>) -> Result<(), AppError> {
+        // Store in database if available
+        if let Some(db) = &self.db {
+            match db.insert_readings(&readings).await {
+                Ok(ids) => {
+                    tracing::debug!(count = ids.len(), "Stored reading batch in database");
+                }
+                Err(e) => {
+                    tracing::error!(error = ?e, "Failed to store reading batch in database, continuing with in-memory only");
+                    // Continue execution - fallback to in-memory
+                }
+            }
+        }
+
+        // Always store in memory for WebSocket streaming
+        for r in readings {
+            if self.readings.len() >= self.max {
+                self.readings.pop_front();
+            }
+            self.readings.push_back(r);
+        }
+
+        Ok(())
+    }
+
     /// Get recent observations, preferring database if available, fallback to in-memory
     pub async fn recent_observations(
         &self,
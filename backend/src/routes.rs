@@ -11,6 +11,9 @@ use crate::fhir::FhirObservation;
 use crate::ml_client::MlClient;
 use crate::ws::{ws_live, WsHub};
 
+/// Maximum number of readings accepted by a single batch ingest request
+const MAX_INGEST_BATCH: usize = 1000;
+
 pub fn configure(cfg: &mut web::ServiceConfig) {
     let (tx, _rx) = broadcast::channel::<FhirObservation>(256);
 
@@ -33,6 +36,7 @@ pub fn configure(cfg: &mut web::ServiceConfig) {
         .route("/auth/token", web::post().to(generate_device_token))
         .route("/ws/live", web::get().to(ws_live)) // WebSocket endpoint (public for browser compatibility)
         .route("/ingest", web::post().to(ingest_public)) // Public ingest for simulator/mock data
+        .route("/ingest/batch", web::post().to(ingest_batch_public)) // Public batch ingest for the serial reader
         // Protected endpoints (JWT required)
         .service(
             web::scope("/api")
@@ -230,6 +234,50 @@ async fn ingest_public(
     Ok(HttpResponse::Ok().json(obs))
 }
 
+// Public batch ingest endpoint (no auth required - for the serial reader)
+async fn ingest_batch_public(
+    state: web::Data<Arc<Mutex<AppState>>>,
+    hub: web::Data<WsHub>,
+    payload: web::Json<Vec<SensorReading>>,
+) -> Result<HttpResponse, AppError> {
+    let readings = payload.into_inner();
+    tracing::debug!(
+        count = readings.len(),
+        "Public batch ingest request (no auth)"
+    );
+
+    if readings.is_empty() || readings.len() > MAX_INGEST_BATCH {
+        return Err(AppError::BadRequest(format!(
+            "batch must contain between 1 and {} readings",
+            MAX_INGEST_BATCH
+        )));
+    }
+
+    // Validate the whole batch before storing any of it
+    let mut observations = Vec::with_capacity(readings.len());
+    for (i, reading) in readings.iter().enumerate() {
+        reading
+            .validate()
+            .map_err(|e| AppError::BadRequest(format!("reading {}: {}", i, e)))?;
+
+        let obs = FhirObservation::from_reading(reading.clone());
+        obs.validate()
+            .map_err(|e| AppError::BadRequest(format!("reading {}: {}", i, e)))?;
+        observations.push(obs);
+    }
+
+    // Store the batch atomically: one database transaction under a single lock acquisition
+    state.lock().await.push_batch(readings).await?;
+
+    // Push to WebSocket subscribers
+    let ingested = observations.len();
+    for obs in observations {
+        let _ = hub.tx.send(obs);
+    }
+
+    Ok(HttpResponse::Ok().json(serde_json::json!({ "ingested": ingested })))
+}
+
 // Protected ingest endpoint (JWT required)
 async fn ingest(
     req: HttpRequest,
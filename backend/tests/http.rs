@@ -304,3 +304,62 @@ async fn query_with_limit() {
     assert_eq!(body["resourceType"], "Bundle");
     assert_eq!(body["total"], 2);
 }
+
+#[actix_web::test]
+async fn ingest_batch_stores_readings() {
+    let state = web::Data::new(Arc::new(Mutex::new(AppState::new_demo())));
+    let app = test::init_service(App::new().app_data(state).configure(routes::configure)).await;
+
+    let readings: Vec<SensorReading> = (0..3)
+        .map(|i| SensorReading {
+            patient_id: "p1".into(),
+            device_id: "d1".into(),
+            code: SignalCode::Sound,
+            value: 200.0 + i as f64,
+            unit: "raw".into(),
+            ts: chrono::Utc::now(),
+        })
+        .collect();
+
+    let req = test::TestRequest::post()
+        .uri("/ingest/batch")
+        .set_json(&readings)
+        .to_request();
+    let resp = test::call_service(&app, req).await;
+    assert!(resp.status().is_success());
+
+    let body: serde_json::Value = test::read_body_json(resp).await;
+    assert_eq!(body["ingested"], 3);
+}
+
+#[actix_web::test]
+async fn ingest_batch_rejects_invalid_reading() {
+    let state = web::Data::new(Arc::new(Mutex::new(AppState::new_demo())));
+    let app = test::init_service(App::new().app_data(state).configure(routes::configure)).await;
+
+    let readings = vec![
+        SensorReading {
+            patient_id: "p1".into(),
+            device_id: "d1".into(),
+            code: SignalCode::Sound,
+            value: 200.0,
+            unit: "raw".into(),
+            ts: chrono::Utc::now(),
+        },
+        SensorReading {
+            patient_id: "".into(),
+            device_id: "d1".into(),
+            code: SignalCode::Sound,
+            value: 200.0,
+            unit: "raw".into(),
+            ts: chrono::Utc::now(),
+        },
+    ];
+
+    let req = test::TestRequest::post()
+        .uri("/ingest/batch")
+        .set_json(&readings)
+        .to_request();
+    let resp = test::call_service(&app, req).await;
+    assert_eq!(resp.status(), 400);
+}
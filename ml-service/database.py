@@ -3,35 +3,154 @@ Database interface for ML service.
 Fetches data from PostgreSQL for training and prediction.
 """
 
+import asyncio
+import asyncpg
+import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine, text
-from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
 from typing import Optional, List
 from loguru import logger
 
+READING_COLUMNS = [
+    "id",
+    "patient_id",
+    "device_id",
+    "code",
+    "value",
+    "unit",
+    "timestamp",
+    "created_at",
+]
+
+# Typed arrays for streamed columns; anything else is stored as object
+COLUMN_DTYPES = {
+    "value": np.float64,
+}
+
+# Timestamp columns are collected as objects and converted once at the end
+DATETIME_COLUMNS = {"timestamp", "created_at"}
+
+# Rows per cursor round trip; smaller queries use a single fetch
+FETCH_CHUNK_SIZE = 1000
+
 
 class SoundDatabase:
     """Interface to SoundSense PostgreSQL database."""
 
     def __init__(self, database_url: str):
         """
-        Initialize database connection.
+        Initialize database interface.
+
+        The connection pool is created by connect(), or on first use if it
+        does not exist yet (for example because the database was down at
+        startup).
 
         Args:
             database_url: PostgreSQL connection string
         """
-        # SQLAlchemy 2.0+ requires 'postgresql://' instead of 'postgres://'
-        if database_url.startswith("postgres://"):
-            database_url = database_url.replace("postgres://", "postgresql://", 1)
+        self.database_url = database_url
+        self.pool: Optional[asyncpg.Pool] = None
+        self._pool_lock = asyncio.Lock()
+
+    async def connect(self, min_size: int = 5, max_size: int = 20):
+        """
+        Create the connection pool unless it already exists.
+
+        Args:
+            min_size: Connections opened up front
+            max_size: Upper bound on concurrent connections
+
+        Returns:
+            The connection pool
+        """
+        async with self._pool_lock:
+            if self.pool is None:
+                self.pool = await asyncpg.create_pool(
+                    self.database_url, min_size=min_size, max_size=max_size
+                )
+                logger.info("Database connection pool initialized")
+        return self.pool
+
+    @asynccontextmanager
+    async def _connection(self):
+        """Acquire a pooled connection, creating the pool if needed."""
+        pool = self.pool if self.pool is not None else await self.connect()
+        async with pool.acquire() as conn:
+            yield conn
+
+    async def close(self):
+        """Close the connection pool."""
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+            logger.info("Database connection pool closed")
+
+    async def _fetch_dataframe(
+        self, query: str, *params, columns: List[str]
+    ) -> pd.DataFrame:
+        """Run a query on a pooled connection and build a DataFrame."""
+        async with self._connection() as conn:
+            rows = await conn.fetch(query, *params)
+
+        return pd.DataFrame([tuple(row) for row in rows], columns=columns)
+
+    async def _stream_dataframe(
+        self, query: str, *params, columns: List[str], size: int
+    ) -> pd.DataFrame:
+        """
+        Fetch rows in chunks and build each column from the chunk slices.
+
+        Queries bounded by FETCH_CHUNK_SIZE rows use a single fetch; larger
+        ones page through a server-side cursor inside a transaction. Memory
+        follows the rows actually returned, not the size bound.
+
+        Args:
+            query: SQL returning the given columns, at most size rows
+            params: Query parameters
+            columns: Column names in select order
+            size: Upper bound on the number of rows
+
+        Returns:
+            DataFrame built once from the concatenated columns
+        """
+        # One list of column tuples per fetched chunk
+        chunks = []
+
+        async with self._connection() as conn:
+            if size <= FETCH_CHUNK_SIZE:
+                rows = await conn.fetch(query, *params)
+                if rows:
+                    chunks.append(list(zip(*rows)))
+            else:
+                async with conn.transaction():
+                    cursor = await conn.cursor(query, *params)
+                    while True:
+                        rows = await cursor.fetch(FETCH_CHUNK_SIZE)
+                        if not rows:
+                            break
+                        chunks.append(list(zip(*rows)))
+
+        data = {}
+        for i, column in enumerate(columns):
+            dtype = COLUMN_DTYPES.get(column, object)
+            values = np.concatenate(
+                [np.empty(0, dtype=dtype)]
+                + [np.asarray(chunk[i], dtype=dtype) for chunk in chunks]
+            )
+            if column in DATETIME_COLUMNS:
+                # asyncpg returns timestamptz as aware UTC datetimes
+                data[column] = pd.to_datetime(values, utc=True, cache=False)
+            else:
+                data[column] = values
 
-        self.engine = create_engine(database_url)
-        logger.info("Database connection initialized")
+        return pd.DataFrame(data)
 
-    def fetch_recent_readings(
+    async def fetch_readings_full(
         self, limit: int = 1000, hours_back: Optional[int] = None
     ) -> pd.DataFrame:
         """
-        Fetch recent sensor readings.
+        Fetch recent sensor readings with all columns.
 
         Args:
             limit: Maximum number of readings to fetch
@@ -40,33 +159,72 @@ class SoundDatabase:
         Returns:
             DataFrame with columns: id, patient_id, device_id, code, value, unit, timestamp
         """
+        # One canonical statement for every call, so asyncpg's per-connection
+        # statement cache reuses the prepared plan
         query = """
-            SELECT 
-                id, 
-                patient_id, 
-                device_id, 
-                code, 
-                value, 
-                unit, 
+            SELECT
+                id::text,
+                patient_id,
+                device_id,
+                code,
+                value,
+                unit,
                 timestamp,
                 created_at
             FROM sensor_readings
+            WHERE ($1::timestamptz IS NULL OR timestamp >= $1)
+            ORDER BY timestamp DESC
+            LIMIT $2
         """
 
+        cutoff = None
         if hours_back is not None:
-            cutoff = datetime.utcnow() - timedelta(hours=hours_back)
-            query += f" WHERE timestamp >= '{cutoff.isoformat()}'"
+            cutoff = datetime.now(timezone.utc) - timedelta(hours=hours_back)
 
-        query += " ORDER BY timestamp DESC"
-        query += f" LIMIT {limit}"
-
-        with self.engine.connect() as conn:
-            df = pd.read_sql(text(query), conn)
+        df = await self._stream_dataframe(
+            query, cutoff, limit, columns=READING_COLUMNS, size=limit
+        )
 
         logger.info(f"Fetched {len(df)} readings from database")
         return df
 
-    def fetch_readings_by_patient(
+    async def fetch_values_timestamps(
+        self, limit: int = 1000, hours_back: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        Fetch only the value and timestamp of recent sensor readings.
+
+        For callers that never look at the identifying columns.
+
+        Args:
+            limit: Maximum number of readings to fetch
+            hours_back: If set, only fetch readings from last N hours
+
+        Returns:
+            DataFrame with columns: value, timestamp
+        """
+        query = """
+            SELECT
+                value,
+                timestamp
+            FROM sensor_readings
+            WHERE ($1::timestamptz IS NULL OR timestamp >= $1)
+            ORDER BY timestamp DESC
+            LIMIT $2
+        """
+
+        cutoff = None
+        if hours_back is not None:
+            cutoff = datetime.now(timezone.utc) - timedelta(hours=hours_back)
+
+        df = await self._stream_dataframe(
+            query, cutoff, limit, columns=["value", "timestamp"], size=limit
+        )
+
+        logger.info(f"Fetched {len(df)} values from database")
+        return df
+
+    async def fetch_readings_by_patient(
         self, patient_id: str, limit: int = 1000
     ) -> pd.DataFrame:
         """
@@ -80,30 +238,29 @@ class SoundDatabase:
             DataFrame with readings
         """
         query = """
-            SELECT 
-                id, 
-                patient_id, 
-                device_id, 
-                code, 
-                value, 
-                unit, 
+            SELECT
+                id::text,
+                patient_id,
+                device_id,
+                code,
+                value,
+                unit,
                 timestamp,
                 created_at
             FROM sensor_readings
-            WHERE patient_id = :patient_id
+            WHERE patient_id = $1
             ORDER BY timestamp DESC
-            LIMIT :limit
+            LIMIT $2
         """
 
-        with self.engine.connect() as conn:
-            df = pd.read_sql(
-                text(query), conn, params={"patient_id": patient_id, "limit": limit}
-            )
+        df = await self._stream_dataframe(
+            query, patient_id, limit, columns=READING_COLUMNS, size=limit
+        )
 
         logger.info(f"Fetched {len(df)} readings for patient {patient_id}")
         return df
 
-    def fetch_readings_by_time_range(
+    async def fetch_readings_by_time_range(
         self, start_time: datetime, end_time: datetime
     ) -> pd.DataFrame:
         """
@@ -117,42 +274,70 @@ class SoundDatabase:
             DataFrame with readings
         """
         query = """
-            SELECT 
-                id, 
-                patient_id, 
-                device_id, 
-                code, 
-                value, 
-                unit, 
+            SELECT
+                id::text,
+                patient_id,
+                device_id,
+                code,
+                value,
+                unit,
                 timestamp,
                 created_at
             FROM sensor_readings
-            WHERE timestamp BETWEEN :start_time AND :end_time
+            WHERE timestamp BETWEEN $1 AND $2
             ORDER BY timestamp ASC
         """
 
-        with self.engine.connect() as conn:
-            df = pd.read_sql(
-                text(query),
-                conn,
-                params={"start_time": start_time, "end_time": end_time},
-            )
+        df = await self._fetch_dataframe(
+            query, start_time, end_time, columns=READING_COLUMNS
+        )
 
         logger.info(f"Fetched {len(df)} readings between {start_time} and {end_time}")
         return df
 
-    def get_statistics(self) -> dict:
+    async def _fetchrow(self, query: str, *params) -> asyncpg.Record:
+        """Run a single-row query on its own pooled connection."""
+        async with self._connection() as conn:
+            return await conn.fetchrow(query, *params)
+
+    async def ping(self) -> bool:
+        """
+        Check that the database answers queries.
+
+        Returns:
+            True if a trivial query succeeds
+        """
+        return await self._fetchrow("SELECT 1") is not None
+
+    async def fetch_latest_timestamp(self) -> Optional[datetime]:
+        """
+        Get the timestamp of the newest reading.
+
+        Returns:
+            Newest reading timestamp, or None if there are no readings
+        """
+        row = await self._fetchrow("SELECT MAX(timestamp) FROM sensor_readings")
+        return row[0]
+
+    async def get_statistics(self) -> dict:
         """
         Get database statistics.
 
+        The counts and the value/timestamp aggregates are independent, so
+        they run concurrently on separate pooled connections.
+
         Returns:
             Dictionary with stats
         """
-        query = """
-            SELECT 
+        counts_query = """
+            SELECT
                 COUNT(*) as total_readings,
                 COUNT(DISTINCT patient_id) as unique_patients,
-                COUNT(DISTINCT device_id) as unique_devices,
+                COUNT(DISTINCT device_id) as unique_devices
+            FROM sensor_readings
+        """
+        aggregates_query = """
+            SELECT
                 MIN(timestamp) as earliest_reading,
                 MAX(timestamp) as latest_reading,
                 AVG(value) as avg_value,
@@ -160,23 +345,24 @@ class SoundDatabase:
             FROM sensor_readings
         """
 
-        with self.engine.connect() as conn:
-            result = conn.execute(text(query)).fetchone()
+        counts, aggregates = await asyncio.gather(
+            self._fetchrow(counts_query), self._fetchrow(aggregates_query)
+        )
 
         stats = {
-            "total_readings": result[0],
-            "unique_patients": result[1],
-            "unique_devices": result[2],
-            "earliest_reading": result[3],
-            "latest_reading": result[4],
-            "avg_value": float(result[5]) if result[5] else 0.0,
-            "stddev_value": float(result[6]) if result[6] else 0.0,
+            "total_readings": counts[0],
+            "unique_patients": counts[1],
+            "unique_devices": counts[2],
+            "earliest_reading": aggregates[0],
+            "latest_reading": aggregates[1],
+            "avg_value": float(aggregates[2]) if aggregates[2] else 0.0,
+            "stddev_value": float(aggregates[3]) if aggregates[3] else 0.0,
         }
 
         logger.info(f"Database stats: {stats['total_readings']} total readings")
         return stats
 
-    def create_training_dataset(self, min_readings: int = 100) -> pd.DataFrame:
+    async def create_training_dataset(self, min_readings: int = 100) -> pd.DataFrame:
         """
         Create labeled training dataset.
 
@@ -188,7 +374,26 @@ class SoundDatabase:
         Returns:
             DataFrame with columns: value, timestamp, label
         """
-        df = self.fetch_recent_readings(limit=10000)
+        # Labels follow SoundClassifier.thresholds and are computed in SQL
+        query = """
+            SELECT
+                value,
+                timestamp,
+                CASE
+                    WHEN value < 187 THEN 'quiet'
+                    WHEN value < 300 THEN 'normal'
+                    WHEN value < 500 THEN 'moderate'
+                    WHEN value < 700 THEN 'loud'
+                    ELSE 'concerning'
+                END AS label
+            FROM sensor_readings
+            ORDER BY timestamp DESC
+            LIMIT 10000
+        """
+
+        df = await self._stream_dataframe(
+            query, columns=["value", "timestamp", "label"], size=10000
+        )
 
         if len(df) < min_readings:
             logger.warning(
@@ -196,22 +401,7 @@ class SoundDatabase:
             )
             return pd.DataFrame()
 
-        # Create labels based on value thresholds
-        def label_value(value):
-            if value < 187:
-                return "quiet"
-            elif value < 300:
-                return "normal"
-            elif value < 500:
-                return "moderate"
-            elif value < 700:
-                return "loud"
-            else:
-                return "concerning"
-
-        df["label"] = df["value"].apply(label_value)
-
         logger.info(f"Created training dataset with {len(df)} samples")
         logger.info(f"Label distribution:\n{df['label'].value_counts()}")
 
-        return df[["value", "timestamp", "label"]]
+        return df
@@ -11,16 +11,85 @@ Classifies sound levels into categories:
 Also detects anomalies and patterns.
 """
 
+import hashlib
+import os
 import numpy as np
 import pandas as pd
 import joblib
+import onnxruntime as ort
 from sklearn.ensemble import IsolationForest, RandomForestClassifier
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
+from sklearn.utils.validation import check_is_fitted
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
 from typing import Optional, Tuple
 from datetime import datetime, timedelta
 from pathlib import Path
 from loguru import logger
+from numba import njit, prange
+from cachetools import LRUCache
+
+N_FEATURES = 7
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _extract_features_kernel(values, hours, dows, order, offset, inv_scale):
+    """
+    Compute the feature matrix in a single pass over the readings.
+
+    Each feature is standardized as (feature - offset) * inv_scale before it
+    is written, so scaling costs no extra pass over the matrix.
+
+    Args:
+        values: Sound values in the caller's row order
+        hours: Hour of day per reading
+        dows: Day of week per reading
+        order: Row indices sorting the readings by timestamp
+        offset: Per-feature mean to subtract (zeros for raw features)
+        inv_scale: Per-feature reciprocal std (ones for raw features)
+
+    Returns:
+        Feature matrix (N x 7, float32) in the caller's row order
+    """
+    n = values.shape[0]
+    out = np.empty((n, N_FEATURES), dtype=np.float32)
+
+    for i in prange(n):
+        row = order[i]
+        value = values[row]
+
+        # Rolling statistics (5-reading window, sample std)
+        start = max(0, i - 4)
+        count = i - start + 1
+        total = 0.0
+        for j in range(start, i + 1):
+            total += values[order[j]]
+        mean = total / count
+        std = 0.0
+        if count > 1:
+            sq = 0.0
+            for j in range(start, i + 1):
+                diff = values[order[j]] - mean
+                sq += diff * diff
+            std = np.sqrt(sq / (count - 1))
+
+        # Rate of change
+        rate_of_change = 0.0
+        if i > 0:
+            rate_of_change = value - values[order[i - 1]]
+
+        hour = hours[row]
+        night = 1.0 if hour >= 22 or hour < 6 else 0.0  # Night flag
+        out[row, 0] = (value - offset[0]) * inv_scale[0]
+        out[row, 1] = (mean - offset[1]) * inv_scale[1]
+        out[row, 2] = (std - offset[2]) * inv_scale[2]
+        out[row, 3] = (rate_of_change - offset[3]) * inv_scale[3]
+        out[row, 4] = (hour - offset[4]) * inv_scale[4]
+        out[row, 5] = (dows[row] - offset[5]) * inv_scale[5]
+        out[row, 6] = (night - offset[6]) * inv_scale[6]
+
+    return out
 
 
 class SoundClassifier:
@@ -46,56 +115,72 @@ class SoundClassifier:
         self.anomaly_detector = None
         self.scaler = StandardScaler()
 
+        # Scaler parameters folded into the feature kernel (set once fitted)
+        self._mean = None
+        self._inv_scale = None
+
+        # Scaled features of recently seen batches, keyed by batch content
+        self._feature_cache = LRUCache(maxsize=16)
+
+        # ONNX Runtime sessions used for inference when exported models exist
+        self.classifier_session = None
+        self.anomaly_session = None
+
         # Thresholds for rule-based classification
         self.thresholds = {"quiet": 187, "normal": 300, "moderate": 500, "loud": 700}
+        self._threshold_values = np.array(list(self.thresholds.values()))
+        self._category_labels = np.array(
+            ["quiet", "normal", "moderate", "loud", "concerning"]
+        )
 
-    def extract_features(self, df: pd.DataFrame) -> np.ndarray:
+    def _feature_inputs(self, df: pd.DataFrame) -> Tuple[np.ndarray, ...]:
         """
-        Extract features from sound readings.
+        Prepare the column arrays the feature kernel reads.
 
         Args:
             df: DataFrame with columns: value, timestamp
 
         Returns:
-            Feature matrix
+            Tuple of (values, hours, dows, order)
         """
-        features = []
-
         # Ensure timestamp is datetime
         if not pd.api.types.is_datetime64_any_dtype(df["timestamp"]):
             df["timestamp"] = pd.to_datetime(df["timestamp"])
 
-        # Sort by timestamp
-        df = df.sort_values("timestamp").reset_index(drop=True)
+        # Rolling features are computed in time order, but rows are written
+        # in the caller's row order so each feature row lines up with df
+        ts = df["timestamp"].dt
+        order = np.argsort(df["timestamp"].to_numpy(), kind="stable")
 
-        for idx in range(len(df)):
-            row_features = []
-
-            # Raw value
-            row_features.append(df.loc[idx, "value"])
-
-            # Rolling statistics (5-reading window)
-            window_start = max(0, idx - 4)
-            window = df.loc[window_start:idx, "value"]
-            row_features.append(window.mean())
-            row_features.append(window.std() if len(window) > 1 else 0)
+        return (
+            df["value"].to_numpy(dtype=np.float64),
+            ts.hour.to_numpy(dtype=np.int64),
+            ts.dayofweek.to_numpy(dtype=np.int64),
+            order.astype(np.int64),
+        )
 
-            # Rate of change
-            if idx > 0:
-                rate_of_change = df.loc[idx, "value"] - df.loc[idx - 1, "value"]
-            else:
-                rate_of_change = 0
-            row_features.append(rate_of_change)
+    def extract_features(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Extract features from sound readings.
 
-            # Time features
-            ts = df.loc[idx, "timestamp"]
-            row_features.append(ts.hour)
-            row_features.append(ts.dayofweek)
-            row_features.append(1 if 22 <= ts.hour or ts.hour < 6 else 0)  # Night flag
+        Args:
+            df: DataFrame with columns: value, timestamp
 
-            features.append(row_features)
+        Returns:
+            Feature matrix (float32, the precision the tree models use)
+        """
+        return _extract_features_kernel(
+            *self._feature_inputs(df),
+            np.zeros(N_FEATURES, dtype=np.float32),
+            np.ones(N_FEATURES, dtype=np.float32),
+        )
 
-        return np.array(features)
+    def _set_scaler(self, scaler: StandardScaler):
+        """Use a fitted scaler and fold its parameters into the kernel."""
+        self.scaler = scaler
+        self._mean = scaler.mean_.astype(np.float32)
+        self._inv_scale = (1.0 / scaler.scale_).astype(np.float32)
+        self._feature_cache.clear()
 
     def rule_based_classify(self, value: float) -> str:
         """
@@ -138,6 +223,7 @@ class SoundClassifier:
 
         # Scale features
         X_train_scaled = self.scaler.fit_transform(X_train)
+        self._set_scaler(self.scaler)
         X_test_scaled = self.scaler.transform(X_test)
 
         # Train classifier
@@ -170,6 +256,7 @@ class SoundClassifier:
 
         # Scale features
         X_scaled = self.scaler.fit_transform(X)
+        self._set_scaler(self.scaler)
 
         # Train anomaly detector
         self.anomaly_detector = IsolationForest(
@@ -182,7 +269,7 @@ class SoundClassifier:
         # Save model
         self.save_anomaly_detector()
 
-    def predict(self, df: pd.DataFrame) -> pd.DataFrame:
+    def predict(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
         """
         Predict classifications and detect anomalies.
 
@@ -190,51 +277,105 @@ class SoundClassifier:
             df: DataFrame with columns: value, timestamp
 
         Returns:
-            DataFrame with added columns: category, is_anomaly, anomaly_score
+            Tuple of (DataFrame with added columns: category, is_anomaly,
+            anomaly_score; dict of feature arrays: hour, dayofweek,
+            scaled_features) so callers can reuse the features
         """
-        result = df.copy()
+        # Reuse features when the same batch was scored recently, e.g. by
+        # /predict and then /analysis
+        cache_key = self._feature_cache_key(df)
+        cached = self._feature_cache.get(cache_key)
+        if cached is None:
+            check_is_fitted(self.scaler)
+            values, hours, dows, order = self._feature_inputs(
+                df[["value", "timestamp"]]
+            )
+            X_scaled = _extract_features_kernel(
+                values, hours, dows, order, self._mean, self._inv_scale
+            )
+            for array in (hours, dows, X_scaled):
+                array.setflags(write=False)
+            self._feature_cache[cache_key] = (hours, dows, X_scaled)
+        else:
+            hours, dows, X_scaled = cached
 
-        # Extract features
-        X = self.extract_features(df[["value", "timestamp"]])
-        X_scaled = self.scaler.transform(X)
+        columns = {}
 
         # Rule-based classification (always available)
-        result["category_rule"] = df["value"].apply(self.rule_based_classify)
+        idx = np.searchsorted(
+            self._threshold_values, df["value"].to_numpy(), side="right"
+        )
+        columns["category_rule"] = self._category_labels[idx]
 
         # ML-based classification (if model trained)
-        if self.classifier is not None:
-            result["category_ml"] = self.classifier.predict(X_scaled)
-            result["category_confidence"] = self.classifier.predict_proba(X_scaled).max(
-                axis=1
-            )
+        if self.classifier_session is not None:
+            X_onnx = np.ascontiguousarray(X_scaled, dtype=np.float32)
+            labels, proba = self.classifier_session.run(None, {"X": X_onnx})
+            columns["category_ml"] = labels
+            columns["category_confidence"] = proba.max(axis=1)
+        elif self.classifier is not None:
+            # One forest traversal; predict() would repeat it for the argmax
+            proba = self.classifier.predict_proba(X_scaled)
+            best = proba.argmax(axis=1)
+            columns["category_ml"] = self.classifier.classes_[best]
+            columns["category_confidence"] = proba[np.arange(len(best)), best]
         else:
-            result["category_ml"] = None
-            result["category_confidence"] = 0.0
+            columns["category_ml"] = None
+            columns["category_confidence"] = 0.0
 
         # Anomaly detection (if model trained)
-        if self.anomaly_detector is not None:
+        if self.anomaly_session is not None:
+            X_onnx = np.ascontiguousarray(X_scaled, dtype=np.float32)
+            labels, scores = self.anomaly_session.run(None, {"X": X_onnx})
+            columns["is_anomaly"] = labels.ravel() == -1
+            # ONNX scores follow decision_function; shift back to score_samples
+            columns["anomaly_score"] = scores.ravel() + self.anomaly_detector.offset_
+        elif self.anomaly_detector is not None:
             anomaly_predictions = self.anomaly_detector.predict(X_scaled)
-            result["is_anomaly"] = anomaly_predictions == -1
-            result["anomaly_score"] = self.anomaly_detector.score_samples(X_scaled)
+            columns["is_anomaly"] = anomaly_predictions == -1
+            columns["anomaly_score"] = self.anomaly_detector.score_samples(X_scaled)
         else:
-            result["is_anomaly"] = False
-            result["anomaly_score"] = 0.0
+            columns["is_anomaly"] = False
+            columns["anomaly_score"] = 0.0
+
+        features = {
+            "hour": hours,
+            "dayofweek": dows,
+            "scaled_features": X_scaled,
+        }
 
-        return result
+        return df.assign(**columns), features
+
+    def _feature_cache_key(self, df: pd.DataFrame) -> bytes:
+        """Digest of the value and timestamp columns the features depend on."""
+        hashes = pd.util.hash_pandas_object(df[["value", "timestamp"]], index=False)
+        return hashlib.blake2b(hashes.to_numpy().tobytes(), digest_size=16).digest()
 
     def save_classifier(self):
         """Save trained classifier to disk."""
         if self.classifier is not None:
-            joblib.dump(self.classifier, self.model_dir / "classifier.joblib")
-            joblib.dump(self.scaler, self.model_dir / "scaler.joblib")
+            self._dump(self.classifier, self.model_dir / "classifier.joblib")
+            self._dump(self.scaler, self.model_dir / "scaler.joblib")
+
+            onnx_path = self.model_dir / "classifier.onnx"
+            self._export_onnx(self.classifier, onnx_path, options={"zipmap": False})
+            self.classifier_session = self._load_session(onnx_path)
             logger.info(f"Classifier saved to {self.model_dir}")
 
     def save_anomaly_detector(self):
         """Save trained anomaly detector to disk."""
         if self.anomaly_detector is not None:
-            joblib.dump(
+            self._dump(
                 self.anomaly_detector, self.model_dir / "anomaly_detector.joblib"
             )
+
+            onnx_path = self.model_dir / "anomaly_detector.onnx"
+            self._export_onnx(
+                self.anomaly_detector,
+                onnx_path,
+                target_opset={"": 15, "ai.onnx.ml": 3},
+            )
+            self.anomaly_session = self._load_session(onnx_path)
             logger.info(f"Anomaly detector saved to {self.model_dir}")
 
     def load_classifier(self):
@@ -243,8 +384,11 @@ class SoundClassifier:
         scaler_path = self.model_dir / "scaler.joblib"
 
         if classifier_path.exists() and scaler_path.exists():
-            self.classifier = joblib.load(classifier_path)
-            self.scaler = joblib.load(scaler_path)
+            self.classifier = joblib.load(classifier_path, mmap_mode="r")
+            self._set_scaler(joblib.load(scaler_path))
+            self.classifier_session = self._load_session(
+                self.model_dir / "classifier.onnx"
+            )
             logger.info("Classifier loaded successfully")
         else:
             logger.warning("No pre-trained classifier found")
@@ -254,17 +398,54 @@ class SoundClassifier:
         path = self.model_dir / "anomaly_detector.joblib"
 
         if path.exists():
-            self.anomaly_detector = joblib.load(path)
+            self.anomaly_detector = joblib.load(path, mmap_mode="r")
+            self.anomaly_session = self._load_session(
+                self.model_dir / "anomaly_detector.onnx"
+            )
             logger.info("Anomaly detector loaded successfully")
         else:
             logger.warning("No pre-trained anomaly detector found")
 
-    def analyze_patterns(self, df: pd.DataFrame) -> dict:
+    def _dump(self, model, path: Path):
+        """
+        Save a model with joblib, replacing any existing file atomically.
+
+        Models are loaded memory-mapped, so the old file must not be
+        truncated in place while a process still maps it.
+        """
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        joblib.dump(model, tmp_path)
+        os.replace(tmp_path, path)
+
+    def _export_onnx(self, model, path: Path, **kwargs):
+        """Export a fitted scikit-learn model to ONNX."""
+        if "options" in kwargs:
+            kwargs["options"] = {id(model): kwargs["options"]}
+
+        onnx_model = convert_sklearn(
+            model,
+            initial_types=[("X", FloatTensorType([None, N_FEATURES]))],
+            **kwargs,
+        )
+        path.write_bytes(onnx_model.SerializeToString())
+
+    def _load_session(self, path: Path) -> Optional[ort.InferenceSession]:
+        """Create an ONNX Runtime session if the exported model exists."""
+        if not path.exists():
+            return None
+
+        return ort.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+
+    def analyze_patterns(
+        self, df: pd.DataFrame, features: Optional[dict] = None
+    ) -> dict:
         """
         Analyze patterns in sound data.
 
         Args:
             df: DataFrame with predictions
+            features: Feature arrays returned by predict, reused instead of
+                re-parsing timestamps
 
         Returns:
             Dictionary with pattern analysis
@@ -284,9 +465,15 @@ class SoundClassifier:
             analysis["anomaly_percentage"] = float(df["is_anomaly"].mean() * 100)
 
         # Time-based patterns
-        if "timestamp" in df.columns:
-            df["hour"] = pd.to_datetime(df["timestamp"]).dt.hour
-            hourly_avg = df.groupby("hour")["value"].mean()
+        if features is not None:
+            hour = features["hour"]
+        elif "timestamp" in df.columns:
+            hour = pd.to_datetime(df["timestamp"]).dt.hour.to_numpy()
+        else:
+            hour = None
+
+        if hour is not None:
+            hourly_avg = df["value"].groupby(hour).mean()
             analysis["peak_hour"] = int(hourly_avg.idxmax())
             analysis["quietest_hour"] = int(hourly_avg.idxmin())
 
@@ -297,3 +484,21 @@ class SoundClassifier:
             )
 
         return analysis
+
+
+def train_and_save(df: pd.DataFrame, model_dir: str):
+    """
+    Train and save the classifier and anomaly detector.
+
+    Module-level so it can run in a worker process; the caller picks up the
+    results by reloading the saved models.
+
+    Args:
+        df: DataFrame with columns: value, timestamp, label
+        model_dir: Directory the models are saved to
+    """
+    logger.info("Starting model training...")
+    classifier = SoundClassifier(model_dir=model_dir)
+    classifier.train_classifier(df)
+    classifier.train_anomaly_detector(df[["value", "timestamp"]])
+    logger.info("Model training completed")
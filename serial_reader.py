@@ -1,70 +1,106 @@
 """
 Simple serial port reader for Arduino that sends data to the backend API.
 This runs natively on Windows to access COM ports directly.
+
+Reading and sending run as separate asyncio tasks joined by a queue, so the
+next serial read does not wait for the previous POST to finish. Readings are
+sent in batches of up to BATCH_SIZE, or whatever arrived within BATCH_WINDOW.
+Requires: pip install pyserial httpx orjson
+(plus "httpx[http2]" to use HTTP/2 with an https backend URL)
 """
+import asyncio
 import serial
-import requests
-import time
+import httpx
+import orjson
 import json
 from datetime import datetime
-import re
 
 # Configuration
 SERIAL_PORT = "COM4"
 BAUD_RATE = 9600
-BACKEND_URL = "http://localhost:8080/ingest"
+BACKEND_URL_BATCH = "http://localhost:8080/ingest/batch"
+SOUND_PREFIX = b"SOUND:"
+QUEUE_SIZE = 1000
+BATCH_SIZE = 50
+BATCH_WINDOW = 0.25  # seconds after the first queued reading
 
-def read_and_send():
-    """Read from serial port and send to backend API"""
+def parse_sound_line(line):
+    """Return the value of a complete SOUND:### line, or None"""
+    if not (line.startswith(SOUND_PREFIX) and line.endswith(b"\n")):
+        return None
+    digits = line[len(SOUND_PREFIX):].strip()
+    if not digits.isdigit():
+        return None
+    return int(digits)
+
+async def reader(ser, queue):
+    """Read lines from the serial port and queue sensor reading payloads"""
+    while True:
+        # readline blocks until a line or the port timeout, so run it off the loop
+        line = await asyncio.to_thread(ser.readline)
+
+        if line.strip():
+            value = parse_sound_line(line)
+            if value is not None:
+                print(f"Received: SOUND:{value}")
+
+                # Create sensor reading payload
+                payload = {
+                    "patient_id": "demo-patient-1",
+                    "device_id": f"arduino-{SERIAL_PORT}",
+                    "code": "sound",
+                    "value": float(value),
+                    "unit": "raw",
+                    "ts": datetime.utcnow().isoformat() + "Z"
+                }
+                await queue.put(payload)
+            else:
+                print(f"Received: {line!r}")
+                print(f"  (Ignored - doesn't match SOUND:### pattern)")
+
+async def collect_batch(queue):
+    """Wait for a payload, then add more until the batch is full or the window closes"""
+    loop = asyncio.get_running_loop()
+    batch = [await queue.get()]
+    deadline = loop.time() + BATCH_WINDOW
+
+    while len(batch) < BATCH_SIZE:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), remaining))
+        except asyncio.TimeoutError:
+            break
+
+    return batch
+
+async def sender(client, queue):
+    """Drain queued payloads and send them to the backend in batches"""
+    while True:
+        batch = await collect_batch(queue)
+        try:
+            response = await client.post(
+                BACKEND_URL_BATCH,
+                content=orjson.dumps(batch),
+                headers={"Content-Type": "application/json"},
+            )
+            if response.status_code == 200:
+                print(f"  ✓ Sent {len(batch)} readings to backend")
+            else:
+                print(f"  ✗ Backend returned status {response.status_code}")
+        except httpx.HTTPError as e:
+            print(f"  ✗ Failed to send to backend: {e}")
+        finally:
+            for _ in batch:
+                queue.task_done()
+
+async def main():
+    """Open the serial port and run the reader and sender tasks"""
     print(f"Opening serial port {SERIAL_PORT} at {BAUD_RATE} baud...")
-    
+
     try:
         ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
-        print(f"✓ Connected to {SERIAL_PORT}")
-        print(f"Sending data to {BACKEND_URL}")
-        print("Reading data... (Press Ctrl+C to stop)\n")
-        
-        # Pattern: SOUND:123
-        pattern = re.compile(r'^SOUND:(\d+)\s*$')
-        
-        while True:
-            try:
-                line = ser.readline().decode('utf-8', errors='ignore').strip()
-                
-                if line:
-                    print(f"Received: {line}")
-                    
-                    match = pattern.match(line)
-                    if match:
-                        value = int(match.group(1))
-                        
-                        # Create sensor reading payload
-                        payload = {
-                            "patient_id": "demo-patient-1",
-                            "device_id": f"arduino-{SERIAL_PORT}",
-                            "code": "sound",
-                            "value": float(value),
-                            "unit": "raw",
-                            "ts": datetime.utcnow().isoformat() + "Z"
-                        }
-                        
-                        # Send to backend
-                        try:
-                            response = requests.post(BACKEND_URL, json=payload, timeout=2)
-                            if response.status_code == 200:
-                                print(f"  ✓ Sent value {value} to backend")
-                            else:
-                                print(f"  ✗ Backend returned status {response.status_code}")
-                        except requests.exceptions.RequestException as e:
-                            print(f"  ✗ Failed to send to backend: {e}")
-                    else:
-                        print(f"  (Ignored - doesn't match SOUND:### pattern)")
-                        
-            except UnicodeDecodeError:
-                pass  # Skip invalid data
-                
-            time.sleep(0.01)  # Small delay
-            
     except serial.SerialException as e:
         print(f"✗ Error opening serial port: {e}")
         print(f"\nMake sure:")
@@ -72,13 +108,30 @@ def read_and_send():
         print(f"  2. No other program is using the port")
         print(f"  3. Arduino IDE Serial Monitor is closed")
         return 1
-    except KeyboardInterrupt:
-        print("\n\nStopped by user")
-        return 0
+
+    print(f"✓ Connected to {SERIAL_PORT}")
+    print(f"Sending data to {BACKEND_URL_BATCH}")
+    print("Reading data... (Press Ctrl+C to stop)\n")
+
+    queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    try:
+        # One pooled client for all POSTs; HTTP/2 only applies to https URLs
+        # and needs the optional h2 package, so plain http stays on HTTP/1.1
+        http2 = BACKEND_URL_BATCH.startswith("https://")
+        async with httpx.AsyncClient(http2=http2, timeout=2) as client:
+            await asyncio.gather(reader(ser, queue), sender(client, queue))
     finally:
-        if 'ser' in locals() and ser.is_open:
+        if ser.is_open:
             ser.close()
             print(f"Closed {SERIAL_PORT}")
 
+def read_and_send():
+    """Read from serial port and send to backend API"""
+    try:
+        return asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n\nStopped by user")
+        return 0
+
 if __name__ == "__main__":
     exit(read_and_send())